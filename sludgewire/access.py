@@ -1,10 +1,20 @@
 import os
+import ast
 import json
 from typing import Literal
-from twilio.rest import Client
+from functools import lru_cache
 from sqlalchemy import create_engine, text as sql_text
 import pandas as pd
 
+@lru_cache(maxsize=1)
+def load_env():
+    """
+    Loads .env into the environment, once per process (updaters get made over and over, the file doesn't change).
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    return
+
 class Access:
     """
     Handles credentials and connections.
@@ -15,8 +25,7 @@ class Access:
     """
     def __init__(self, chamber=Literal['house', 'senate', 'h', 's'], force_env=None):
         if not "HEROKU" in os.environ and not force_env:
-            from dotenv import load_dotenv
-            load_dotenv()
+            load_env()
 
         for k in [
             'DB_HOST', 'DB_PORT', 'DB_USER', 'DB_PASSWORD',
@@ -32,51 +41,110 @@ class Access:
         else:
             raise ValueError("bad chamber!")
 
+        # one pooled engine per database, reused for the life of the object
+        self._engines = {}
+        self._twilio_client = None
+
     def make_sql_engine(self, echo=False):
         """
         Note: 
         - pd.read_sql needs engine.connect()
         - df.to_sql only needs engine
+        - engines are cached (keyed on the connection string, so changing DB_TABLE still works)
+          and keep their connection pool between calls ... use close() to release them
+
+        """
+        dbstr = """mysql+pymysql://{}:{}@{}:{}/{}""".format(
+            self.DB_USER, 
+            self.DB_PASSWORD, 
+            self.DB_HOST, 
+            str(self.DB_PORT),
+            self.DB_TABLE)
+        if (dbstr, echo) not in self._engines:
+            self._engines[(dbstr, echo)] = create_engine(
+                dbstr, echo=echo, pool_pre_ping=True, pool_recycle=1800
+            )
+        return self._engines[(dbstr, echo)]
 
+    @property
+    def engine(self):
         """
-        dbstr = """mysql+pymysql://{}:{}@{}:{}/{}"""
-        return create_engine(
-            dbstr.format(
-                self.DB_USER, 
-                self.DB_PASSWORD, 
-                self.DB_HOST, 
-                str(self.DB_PORT),
-                self.DB_TABLE), echo=echo
-        )
+        Cached engine for the current DB_TABLE (see make_sql_engine).
+        """
+        return self.make_sql_engine()
+
+    def close(self):
+        for engine in self._engines.values():
+            engine.dispose()
+        self._engines = {}
+        return
     
     def query(self, q):
-        engine = self.make_sql_engine()
-        with engine.connect() as conn:
+        with self.engine.begin() as conn: # begin() commits on exit
             conn.execute(sql_text(q))
-        engine.dispose()
         return
         
-    def write_to_db(self, df, table, if_exists='append', index=False):
-        engine = self.make_sql_engine()
-        df.to_sql(table, con=engine, if_exists=if_exists, index=index) # to_sql needs a "engine" object
-        engine.dispose()
+    def write_to_db(self, df, table, if_exists='append', index=False, chunksize=None, method="multi"):
+        """
+        Rows go in as multi-row INSERTs, chunksize rows per statement.
+
+        chunksize defaults to 500 rows, or fewer for wide tables so a statement stays under MySQL's 65535 placeholder limit.
+        method can be None (one row per INSERT, via executemany) or a callable (see DataFrame.to_sql).
+        """
+        if chunksize is None:
+            chunksize = min(500, 65535 // max(1, len(df.columns) + int(index)))
+        df.to_sql(
+            table, con=self.engine, if_exists=if_exists, index=index,
+            chunksize=chunksize, method=method
+            ) # to_sql needs a "engine" object
         return
 
-    def read_from_db(self, q):
-        engine = self.make_sql_engine()
-        df = pd.read_sql(sql_text(q), engine.connect()) # read_sql needs a "connect" object
-        engine.dispose()
+    def read_from_db(self, q, params=None):
+        """
+        q can be a query string or an already built sql_text() statement.
+        Pass values through params (with bindparams on q) instead of formatting them into the query.
+        """
+        if isinstance(q, str):
+            q = sql_text(q)
+        with self.engine.connect() as conn:
+            df = pd.read_sql(q, conn, params=params) # read_sql needs a "connect" object
         return df
     
-    def send_text(self, payload):
-        client = Client(self.twilio_sid, self.twilio_auth)
+    def read_in_chunks(self, q, param: str, values, chunk_size: int=1000) -> set:
+        """
+        Runs q over values, chunk_size at a time, and returns every value of its first column (as a set).
 
+        q needs an expanding bindparam named param, like "... where x in :param".
+        Values go in as bound params in chunks, to keep each query under the packet limit. All chunks share one connection.
+        """
+        values = list(values)
+        found = set()
+        with self.engine.connect() as conn:
+            for i in range(0, len(values), chunk_size):
+                found.update(conn.execute(q, {param: values[i:i+chunk_size]}).scalars())
+        return found
+
+    @property
+    def twilio_client(self):
+        """
+        One twilio client per object, made on first use (it keeps its http session between texts).
+        """
+        if self._twilio_client is None:
+            from twilio.rest import Client
+            self._twilio_client = Client(self.TWILIO_SID, self.TWILIO_AUTH)
+        return self._twilio_client
+
+    def send_text(self, payload):
         # in case phone numbers is a stringified list...
-        if isinstance(self.phone_numbers, str):
-            self.phone_numbers=eval(self.phone_numbers)
+        if isinstance(self.PHONE_NUMBERS, str):
+            self.PHONE_NUMBERS = ast.literal_eval(self.PHONE_NUMBERS)
 
-        for n in self.phone_numbers:
-            message = client.messages.create(
+        # one after another ... the client's http session isn't safe to share across threads,
+        # and there are only a few numbers
+        client = self.twilio_client
+        for n in self.PHONE_NUMBERS:
+            client.messages.create(
                 body=payload,
                 from_='+19179822265',
-                to=n)
\ No newline at end of file
+                to=n)
+        return
\ No newline at end of file
@@ -1,47 +1,54 @@
 from datetime import datetime as dt
-from bs4 import BeautifulSoup
 import requests
 import urllib3
 import io
-import pdfquery
+import os
+import tempfile
+import hashlib
 import pandas as pd
 import regex as re
-from lxml import etree
+from lxml import etree, html
 from .house_parser_helpers import (
-    doc_ender,doc_trigger, table_trigger, entry_trigger, 
-    header_check, translate_check, make_ltlh_dict
+    classify_lines, translate_check, make_ltlh_lines
     )
 from .house_parsers import process_ptr_entry
 from typing import Union
 
+# one pool for every pdf download, so connections to the house site get reused
+# (maxsize matches HousePTRUpdater.parse_docs' default max_workers)
+http = urllib3.PoolManager(maxsize=8)
+
+# columns every PTR entry has (process_ptr_entry adds others, like "description", when present)
+ptr_columns = ["owner", "asset", 'transaction_type', 'date', 'notification_date', 'amount', 'over_200']
+ptr_dtypes = {'over_200': bool}
+
 class congressDoc:
-    def __init__(self, input_: Union[bytes, str], spacer: str="||"):
-        self.soup = self.make_soup(input_)
+    def __init__(self, input_: Union[bytes, str], spacer: str="||", http_pool: urllib3.PoolManager=None):
+        self.http_pool = http_pool
+        self.xml = self.make_xml(input_)
         self.spacer=spacer
         self.all_transactions = []
         self.table_transactions = []
         self.entry = []
         return
 
-    def make_soup(self, input_: Union[bytes, str]):
+    def make_xml(self, input_: Union[bytes, str]) -> bytes:
         """
-        Converts either a url (pointing to a .pdf) or the bytes of a .pdf file into BeautifulSoup.
+        Gets the xml for either a url (pointing to a .pdf) or the bytes of an already extracted .pdf.
 
         Input:
             input_ (bytes or str) - address or data for a .pdf document
         
         Output:
-            soup - BeautifulSoup of input_
+            xml (bytes) - xml of input_, parsed page by page in full_parse
         """
         if isinstance(input_, str) and input_.startswith("http"):
-            xml = load_xml(input_)
+            xml = load_xml(input_, self.http_pool)
         elif isinstance(input_, bytes):
             xml = input_
         else:
             raise TypeError("input must be url or bytes!!")
-        
-        soup = BeautifulSoup(xml, "xml")
-        return soup
+        return xml
 
     def reset_entry(self):
         if self.entry:
@@ -58,68 +65,97 @@ class congressDoc:
 
     def full_parse(self):
         self.active = False
-        for xpage in self.soup.find_all("LTPage"):
-            
-            # make_lthl_dict puts everything in correct order now!
-            # index all lines
-            ltlh_dict = make_ltlh_dict(xpage)
-            
-            # iterate through lines
-            for k,v in ltlh_dict.items():
-                
-                # make line text
-                t = self.spacer.join([t.text.lower().strip() for t in v])
-                
-                if doc_trigger(t):
-                    self.active=True
-                    continue
-                    
-                elif doc_ender(t):
+
+        # make line text for every page
+        # pages are streamed and cleared once their text is pulled,
+        # so only one page of xml is held in memory at a time
+        texts = []
+        for _, xpage in etree.iterparse(io.BytesIO(self.xml), events=("end",), tag="LTPage"):
+            # make_ltlh_lines puts everything in correct order now!
+            for y0, v in make_ltlh_lines(xpage):
+                texts.append(self.spacer.join(["".join(t.itertext()).lower().strip() for t in v]))
+            xpage.clear()
+            # cleared pages still hang off the root, so drop them too
+            while xpage.getprevious() is not None:
+                del xpage.getparent()[0]
+        lines = pd.Series(texts, dtype=object)
+
+        # run every line check once over the whole document
+        checks = classify_lines(lines, self.spacer)
+
+        # iterate through lines
+        for t, is_doc_trigger, is_doc_ender, is_table_trigger, is_entry_trigger, is_header in zip(
+            lines, *[checks[c].to_numpy() for c in checks.columns]
+            ):
+
+            if is_doc_trigger:
+                self.active=True
+                continue
+
+            elif is_doc_ender:
+                self.reset_table()
+                self.active=False
+                continue
+
+            elif self.active:
+                if is_table_trigger:
                     self.reset_table()
-                    self.active=False
-                    continue
-                
-                elif self.active:
-                    if table_trigger(t):
-                        self.reset_table()
-                    
-                    else:  
-                        if entry_trigger(t):
-                            self.reset_entry()
-
-                        if not header_check(t, self.spacer):
-                            self.entry.append(translate_check(t, self.spacer))
+
+                else:
+                    if is_entry_trigger:
+                        self.reset_entry()
+
+                    if not is_header:
+                        self.entry.append(translate_check(t, self.spacer))
     
+    def make_records(self) -> list:
+        """
+        Makes one dict per transaction (see process_ptr_entry).
+        """
+        if not self.all_transactions:
+            return []
+        return [process_ptr_entry(c, self.spacer) for c in self.all_transactions[0]]
+
     def make_dataframe(self) -> pd.DataFrame:
         """
-        Makes dataframe from transactions and adds PTR document metadata (from "row").
+        Makes dataframe from transactions.
+
+        Docs with no transactions give an empty dataframe with the PTR columns.
         """
-        df_ = pd.DataFrame([process_ptr_entry(c, self.spacer) for c in self.all_transactions[0]])
-        return df_ 
+        return make_ptr_dataframe(self.make_records())
+
+def make_ptr_dataframe(records: list) -> pd.DataFrame:
+    """
+    Makes a dataframe from PTR transaction records (from one doc or many), with the PTR columns even if there are none.
+    """
+    if not records:
+        return pd.DataFrame(columns=ptr_columns).astype(ptr_dtypes)
+    return pd.DataFrame.from_records(records).astype(ptr_dtypes)
 
 def get_entry_data(row) -> tuple:
     """
     Extracts and formats data for one row of document search results.
 
     Input:
-        row - one row of document search results
+        row - one row of document search results (lxml element)
 
     Outputs:
         (tuple) - formatted document data
     """
-    output = [t.text.strip() for t in row.find_all('td')]
-    output.append(row.find_all('td')[0].a['href'])
+    tds = row.findall('td')
+    output = [td.text_content().strip() for td in tds]
+    output.append(tds[0].find('.//a').get('href'))
     return tuple(output)
 
-def get_doc_list(params=None) -> list:
+def iter_doc_list(params=None):
     """
-    Formats document search results.
+    Formats document search results, one at a time.
 
     Input:
         params (None) - query params for document search ... only here for testing purposes, default is the entire current year.
 
     Output:
-        doc_list (list) - list of formatted document search results
+        (generator) - formatted document search results
     """
     base_url = 'https://disclosures-clerk.house.gov/FinancialDisclosure/ViewMemberSearchResult'
     if not params:
@@ -127,30 +163,109 @@ def get_doc_list(params=None) -> list:
             "FilingYear":dt.now().year
         }
     r = requests.post(base_url, params=params)
-    soup = BeautifulSoup(r.content, 'lxml')
-    doc_list = [get_entry_data(row) for row in soup.find_all('tr')[1:]]
-    return doc_list
+    for row in html.fromstring(r.content).xpath('//tr')[1:]:
+        yield get_entry_data(row)
 
-def load_xml(url: str):
+def get_doc_list(params=None) -> list:
     """
-    Extracts xml from a url pointing to a .pdf file.
+    Formats document search results. See iter_doc_list.
+
+    Output:
+        doc_list (list) - list of formatted document search results
+    """
+    return list(iter_doc_list(params))
+
+def load_pdf(url: str, http_pool: urllib3.PoolManager=None) -> bytes:
+    """
+    Downloads a .pdf file. Uses a shared connection pool, so it's safe (and faster) to call from several threads.
 
     Input:
         url (str) - url pointing to a document in .pdf format
+        http_pool (PoolManager) - pool to download with, defaults to the module's shared one
+
+    Output:
+        pdf (bytes) - contents of the .pdf file
+    """
+    return (http_pool or http).request("GET", url).data
+
+def pdf_to_xml(pdf: bytes, cache_dir: str=None) -> bytes:
+    """
+    Extracts xml from the contents of a .pdf file.
+
+    Input:
+        pdf (bytes) - contents of a .pdf file
+        cache_dir (str) - if set, xml is cached here under a hash of the pdf, so a pdf is only ever extracted once
 
     Output:
-        xml (str?) - extracted xml of .pdf file
+        xml (bytes) - extracted xml of .pdf file
     """
-    http = urllib3.PoolManager()
-    temp = io.BytesIO()
-    temp.write(http.request("GET", url).data)
-    pq = pdfquery.PDFQuery(temp)
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, hashlib.blake2b(pdf, digest_size=16).hexdigest() + ".xml")
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                return f.read()
+
+    # pdfquery (and pdfminer under it) is slow to import, so only pay for it when there's a pdf to extract
+    import pdfquery
+
+    pq = pdfquery.PDFQuery(io.BytesIO(pdf))
     pq.load()
     xml = etree.tostring(pq.tree)
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        # written to a temp file and moved into place, so a killed run (or two workers on the same pdf)
+        # can't leave a truncated .xml in the cache
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(xml)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
     return xml
 
+def parse_pdf(pdf: bytes, cache_dir: str=None) -> list:
+    """
+    Extracts and parses the transactions from the contents of a PTR .pdf file, start to finish.
+    (module level so it can be sent to a process pool)
+
+    Input:
+        pdf (bytes) - contents of a .pdf file
+        cache_dir (str) - see pdf_to_xml
+
+    Output:
+        (list) - one dict per transaction in the doc, see congressDoc.make_records
+    """
+    cd = congressDoc(pdf_to_xml(pdf, cache_dir))
+    cd.full_parse()
+    return cd.make_records()
+
+def load_xml(url: str, http_pool: urllib3.PoolManager=None):
+    """
+    Extracts xml from a url pointing to a .pdf file.
+
+    Input:
+        url (str) - url pointing to a document in .pdf format
+        http_pool (PoolManager) - see load_pdf
+
+    Output:
+        xml (bytes) - extracted xml of .pdf file
+    """
+    return pdf_to_xml(load_pdf(url, http_pool))
+
+# state code from a jurisdiction like "AZ01"
+state_regex = re.compile(r"([A-Z]{2})(?:\d\d)")
+
 def make_state(jurisdiction):
     try:
-        return re.search(r"([A-Z]{2})(?:\d\d)", jurisdiction).group(1)
+        return state_regex.search(jurisdiction).group(1)
     except AttributeError:
-        return None
\ No newline at end of file
+        return None
+
+def make_state_series(jurisdictions: pd.Series) -> pd.Series:
+    """
+    make_state for a whole column of jurisdictions at once (NaN where there's no state).
+    """
+    return jurisdictions.str.extract(state_regex.pattern, expand=False)
\ No newline at end of file
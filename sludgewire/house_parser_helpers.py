@@ -3,19 +3,108 @@ Helper functions for parsing document xml.
 """
 
 import regex as re
+import pandas as pd
+from collections import defaultdict
 
-def make_ltlh_dict(xpage) -> dict:
-    ltlh_dict = {}
-    for l in xpage.find_all('LTTextLineHorizontal'):
-        x0, y0, x1, y1 = tuple([float(i) for i in eval(l['bbox'])])
-        if y0 in ltlh_dict:
-            ltlh_dict[y0].append(l)
-        else:
-            ltlh_dict[y0] = [l]
-    sorted_dict = {
-        k:sorted(v, key=lambda i: float(i['x0'])) for k,v in ltlh_dict.items()
-        }
-    return dict(sorted(sorted_dict.items(), reverse=True))
+doc_starters = [
+    "t",
+    "transactions",
+    's a: a "a" i',
+    'S A: A "U" I'
+]
+
+doc_enders = [
+    "* for the complete list",
+    'S A B A C D'
+]
+
+table_starters = [
+    's a: a "a" i',
+    'S A: A "U" I',
+    'S B: T',
+    'S C: E I',
+    "S D: L",
+    "S E: P",
+    "S F: A",
+    "S G: G",
+    "S H: T P R",
+    "S I: P M C L H"
+]
+
+table_enders = [
+    '* asset class details available',
+    "* Asset class details available at the bottom of this form. For the complete list of asset type abbreviations, please visit"
+]
+
+# lowercased once here rather than on every call
+# (str.startswith takes a tuple, so each prefix check is a single call)
+doc_starter_set = frozenset(doc_starter.lower() for doc_starter in doc_starters)
+doc_ender_prefixes = tuple(doc_ender.lower() for doc_ender in doc_enders)
+table_starter_prefixes = tuple(table_starter.lower() for table_starter in table_starters)
+table_ender_prefixes = tuple(table_ender.lower() for table_ender in table_enders)
+
+header_strings = [
+    'id transaction date notification amount cap. owner asset',
+    'asset  owner  value of asset  income type(s)  income tx. >',
+    'Owner Value of Asset  Income Type(s) Income  Asset  Tx. >',
+    '$1,000?',
+    'Owner Date  Asset  Tx.  Amount  Cap.',
+    'asset  owner date tx.  amount  cap.',
+    'Type Gains >',
+    '$200?',
+    'Source  Type  Amount',
+    'owner creditor  date incurred  type  amount of',
+    'liability',
+    'owner asset  id  transaction  date  notification  amount  cap.',
+    'transaction id date notification amount cap. owner asset',
+    'type date gains >',
+    '$200?',
+    'owner asset cap. id transaction date  notification  amount',
+    'owner asset cap. amount notification date transaction id',
+    'gains >  type  date',
+    'gains > type date',
+    '* asset class details available at the bottom of this form. for the complete list of asset type abbreviations, please visit',
+    'https://fd.house.gov/reference/asset-type-codes.aspx.'
+    ]
+
+# will combine these eventually, this is overkill rn
+header_regex = r"(?:owner|asset|cap\.|amount|notification|date|transaction|id|type|gains\s\>|\s){5,}"
+header_check_regex = re.compile(header_regex, flags=re.I)
+whitespace_regex = re.compile(r"\s+")
+
+# header strings as they appear in line text (lowercase, single spaced), normalized once here
+header_string_set = frozenset(whitespace_regex.sub(" ", h.lower()) for h in header_strings)
+
+# both entry patterns in one alternation, so each line is scanned once
+entry_trigger_regex = re.compile(
+    r"(?:\w{3})\d{2}\/\d{2}\/20\d{2}|\$[\d,]+\s\-", flags=re.I
+    )
+
+def parse_bbox(bbox: str) -> tuple:
+    """
+    Parses a bbox attribute like "[50.0, 747.516, 57.332, 759.516]" into floats.
+    """
+    return tuple([float(i) for i in bbox.strip("[]()").split(",")])
+
+def make_ltlh_lines(xpage) -> list:
+    """
+    Groups the text lines of a page into rows, top to bottom, each row in order left to right.
+
+    Input:
+        xpage - LTPage element
+
+    Output:
+        (list) - (y0, [LTTextLineHorizontal elements]) for each row
+    """
+    ltlh_dict = defaultdict(list)
+    for l in xpage.iter('LTTextLineHorizontal'):
+        x0, y0, x1, y1 = parse_bbox(l.get('bbox'))
+        # keep x0 with the element so the sort below doesn't re-read it
+        ltlh_dict[y0].append((x0, l))
+    return [
+        (y0, [l for x0, l in sorted(v, key=lambda i: i[0])])
+        for y0, v in sorted(ltlh_dict.items(), key=lambda i: i[0], reverse=True)
+    ]
 
 def translate_check(t: str, spacer: str=" ") -> str:
     t_ = t.replace(spacer, " ")
@@ -27,79 +116,45 @@ def translate_check(t: str, spacer: str=" ") -> str:
         return t
 
 def doc_trigger(t: str) -> bool:
-    doc_starters = [
-        "t",
-        "transactions", 
-        's a: a "a" i',
-        'S A: A "U" I'
-    ]
-    return t.strip() in [doc_starter.lower() for doc_starter in doc_starters]
+    return t.strip() in doc_starter_set
 
 def doc_ender(t: str) -> bool:
-    doc_enders = [
-        "* for the complete list",
-        'S A B A C D'
-    ]
-    return any([t.startswith(doc_ender.lower()) for doc_ender in doc_enders])
+    return t.startswith(doc_ender_prefixes)
 
 def table_trigger(t: str) -> bool:
-    table_starters = [
-        's a: a "a" i',
-        'S A: A "U" I',
-        'S B: T',
-        'S C: E I',
-        "S D: L",
-        "S E: P",
-        "S F: A", 
-        "S G: G",
-        "S H: T P R",
-        "S I: P M C L H"
-    ]
-    return any([t.startswith(table_starter.lower()) for table_starter in table_starters])
+    return t.startswith(table_starter_prefixes)
 
 def table_ender(t: str) -> bool:
-    table_enders = [
-        '* asset class details available',
-        "* Asset class details available at the bottom of this form. For the complete list of asset type abbreviations, please visit"
-    ]
-    return any([t.startswith(table_ender.lower()) for table_ender in table_enders])
-    
+    return t.startswith(table_ender_prefixes)
+
 def entry_trigger(t: str) -> bool:
-    entry_triggers = [
-        r"(?:\w{3})\d{2}\/\d{2}\/20\d{2}",
-        r"\$[\d,]+\s\-"
-    ]
-    return any([re.search(entry_trigger, t, flags=re.I) for entry_trigger in entry_triggers])
+    return bool(entry_trigger_regex.search(t))
 
 def header_check(t: str, spacer: str=" ") -> bool:
-    header_strings = [
-        'id transaction date notification amount cap. owner asset',
-        'asset  owner  value of asset  income type(s)  income tx. >',
-        'Owner Value of Asset  Income Type(s) Income  Asset  Tx. >',
-        '$1,000?',
-        'Owner Date  Asset  Tx.  Amount  Cap.',
-        'asset  owner date tx.  amount  cap.',
-        'Type Gains >',
-        '$200?',
-        'Source  Type  Amount',
-        'owner creditor  date incurred  type  amount of',
-        'liability',
-        'owner asset  id  transaction  date  notification  amount  cap.',
-        'transaction id date notification amount cap. owner asset',
-        'type date gains >',
-        '$200?',
-        'owner asset cap. id transaction date  notification  amount',
-        'owner asset cap. amount notification date transaction id',
-        'gains >  type  date',
-        'gains > type date',
-        '* asset class details available at the bottom of this form. for the complete list of asset type abbreviations, please visit',
-        'https://fd.house.gov/reference/asset-type-codes.aspx.'
-        ]
-    
-    # will combine these eventually, this is overkill rn
-    header_regex = r"(owner|asset|cap\.|amount|notification|date|transaction|id|type|gains\s\>|\s){5,}"
-    
+    t_ = t.replace(spacer, " ")
     return any([
-        t.replace(spacer, " ") in [re.sub(r"\s+", " ", h.lower()) for h in header_strings],
-        re.search(header_regex, t.replace(spacer, " "), flags=re.I)
-    ])
\ No newline at end of file
+        t_ in header_string_set,
+        header_check_regex.search(t_)
+    ])
+
+def classify_lines(lines: pd.Series, spacer: str=" ") -> pd.DataFrame:
+    """
+    Runs the line checks above over every line of a document at once.
+
+    Input:
+        lines (Series) - lowercased line text, joined with spacer
+        spacer (str) - string used to join the text boxes of a line
+
+    Output:
+        (DataFrame) - one boolean column per check, aligned with lines
+    """
+    lines_ = lines.str.replace(spacer, " ", regex=False)
+    return pd.DataFrame({
+        'doc_trigger': lines.str.strip().isin(doc_starter_set),
+        'doc_ender': lines.str.startswith(doc_ender_prefixes),
+        'table_trigger': lines.str.startswith(table_starter_prefixes),
+        'entry_trigger': lines.str.contains(
+            entry_trigger_regex.pattern, case=False, regex=True),
+        'header_check': lines_.isin(header_string_set)
+            | lines_.str.contains(header_regex, case=False, regex=True)
+    }, index=lines.index)
@@ -9,15 +9,49 @@ TODO: check which tables are needed, finish coding
 import regex as re
 from itertools import zip_longest
 
+# compiled once here, these run on every entry of every doc
+id_regex = re.compile(r"^\d{6,}\s")
+date_pair_regex = re.compile(r"\d{2}\/\d{2}\/20\d{2}\s+\d{2}\/\d{2}\/20\d{2}")
+transaction_suffix_regex = re.compile(r"(?:\s)([eps]|(s \(partial\)))$")
+date_regex = re.compile(r"[\d\/]{8,}")
+amount_regex = re.compile(r"\$[\$\d,\s\-]+")
+
+# abbreviated entry categories and their full names
+cat_map = {
+    "f s:": "filing status:",
+    "s o:": "subholding of:",
+    "d:": "description:",
+    "l:": "location:",
+    "c:": "comments:"
+}
+
+# every category prefix (full and abbreviated) in one alternation
+cat_regex = re.compile("|".join([
+    re.escape(cat) for cat in [
+        'filing status:', 'description:', 'subholding of:', "location:", "comments:"
+        ] + list(cat_map.keys())
+    ]))
+
+# schedule A lookups ... income types stay ordered (the first one found in a line wins)
+sked_a_income_types = ('capital gains', 'dividends', 'interest', 'tax-deferred')
+sked_a_income_type_set = frozenset(sked_a_income_types)
+sked_a_values = frozenset([
+    '$50,001 -', '$15,001 - $50,000', '$250,001 -', '$1,001 - $15,000', '$100,001 -', 'none'
+])
+sked_a_incomes = frozenset([
+    '$1 - $200', '$2,501 - $5,000',
+    '$1,001 - $2,500', '$5,001 - $15,000'
+])
+
 def process_ptr_entry(entry: list, spacer: str) -> dict:
     cols=["owner", "asset", 'transaction_type', 'date', 'notification_date', 'amount']
     output = []
     # remove ID if present
-    e0 = re.sub(r"^\d{6,}\s", "", entry[0])
+    e0 = id_regex.sub("", entry[0])
 
     # parse first line into data, splitting connected dates if needed
     for e in e0.split(spacer):
-        if re.search(r"\d{2}\/\d{2}\/20\d{2}\s+\d{2}\/\d{2}\/20\d{2}", e):
+        if date_pair_regex.search(e):
             output += e.split()
         else:
             output.append(e)
@@ -27,8 +61,8 @@ def process_ptr_entry(entry: list, spacer: str) -> dict:
         output.insert(0, "")
 
     # split transaction type from asset if needed
-    if re.search(r"(?:\s)([eps]|(s \(partial\)))$", output[1]):
-        output = output[0:1] + re.split(r"(?:\s)([eps]|(s \(partial\)))$", output[1])[:2] + output[2:]
+    if transaction_suffix_regex.search(output[1]):
+        output = output[0:1] + transaction_suffix_regex.split(output[1])[:2] + output[2:]
             
     output = dict(zip(cols, output))
     output['over_200'] = 'CHECK' in entry
@@ -38,21 +72,10 @@ def process_ptr_entry(entry: list, spacer: str) -> dict:
         entry_+=e.split(spacer)
         
     for e in entry_:
-        cat_map = {
-            "f s:": "filing status:",
-            "s o:": "subholding of:",
-            "d:": "description:",
-            "l:": "location:",
-            "c:": "comments:"
-        }
-
-        for cat in [
-            'filing status:', 'description:', 'subholding of:', "location:", "comments:"
-            ] + list(cat_map.keys()):
-            if e.startswith(cat):
-                cat = cat_map[cat][:-1] if cat in cat_map else cat[:-1]
-                output[cat] = e.split(": ")[1]
-                break
+        m = cat_regex.match(e)
+        if m:
+            cat = cat_map.get(m.group(), m.group())[:-1]
+            output[cat] = e.split(": ")[1]
         else:
             output['asset']+=' ' + e.replace("$50,000", "")
                 
@@ -62,16 +85,6 @@ def process_sked_a_entry(entry: list, spacer: str) -> dict:
     cols=[
         "asset", 'owner', 'value_of_asset', 'income_type', 'income'
     ]
-    income_types = [
-        'capital gains', 'dividends', 'interest', 'tax-deferred'
-    ]
-    values = [
-        '$50,001 -', '$15,001 - $50,000', '$250,001 -', '$1,001 - $15,000', '$100,001 -', 'none'
-    ]
-    incomes = [
-        '$1 - $200', '$2,501 - $5,000', 
-        '$1,001 - $2,500', '$5,001 - $15,000'
-    ]
     
     output = entry[0].split(spacer)
     
@@ -80,26 +93,24 @@ def process_sked_a_entry(entry: list, spacer: str) -> dict:
         
     output = dict(zip_longest(cols, output, fillvalue=""))
     
-    if output['asset'] in values:
+    if output['asset'] in sked_a_values:
         output['value_of_asset'] = output['asset']
         output['asset'] = " ".join(entry[1:])
         
-    if output['owner'] in income_types:
+    if output['owner'] in sked_a_income_type_set:
         output['income_type'] = output['owner']
         output['owner'] = ""
 
-    if output['income_type'] in incomes:
+    if output['income_type'] in sked_a_incomes:
         output['income'] = output['income_type']
         output['income_type'] = ""
     
     def income_type_fixer(e, output):
-        income_type = None
-        try:
-            income_type = next(i for i in income_types if i in e)
-            output['income_type'] = ", ".join([income_type, output['income_type'].replace(",", "").strip()])
-        except StopIteration:
-            pass
-        return output, income_type
+        for income_type in sked_a_income_types:
+            if income_type in e:
+                output['income_type'] = ", ".join([income_type, output['income_type'].replace(",", "").strip()])
+                return output, income_type
+        return output, None
     
     for e in entry[1:]:
         output, income_type = income_type_fixer(e, output)
@@ -108,7 +119,7 @@ def process_sked_a_entry(entry: list, spacer: str) -> dict:
     if income_type:
         output['value_of_asset'] = output['value_of_asset'].replace(income_type, "").strip()
     
-    if output['owner'] in values:
+    if output['owner'] in sked_a_values:
         output['value_of_asset'] = output['owner']
         output['owner'] = ""
                 
@@ -123,18 +134,14 @@ def process_sked_b_entry(entry: list, spacer: str) -> dict:
     if len(e) < len(cols):
         try:
             output['date'] = next(
-                i for i in e if re.search(
-                    r"[\d\/]{8,}", i
-                )
+                i for i in e if date_regex.search(i)
             )
         except StopIteration:
             output['date'] = ""
             
         try:
             output['amount'] = next(
-                i for i in e if re.search(
-                    r"\$[\$\d,\s\-]+", i
-                )
+                i for i in e if amount_regex.search(i)
             )
         except StopIteration:
             output['amount'] = ""
@@ -1,13 +1,29 @@
 import pandas as pd
-import os
 from datetime import datetime as dt
-from .house_helpers import get_doc_list, congressDoc, make_state
+from .house_helpers import iter_doc_list, congressDoc, make_state_series, load_pdf, parse_pdf, make_ptr_dataframe
 from urllib.parse import urljoin
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import lru_cache
+from sqlalchemy import bindparam, text as sql_text
 from .access import Access
 
 pd.options.mode.chained_assignment = None
 
+house_url = 'https://disclosures-clerk.house.gov'
+
+# statements are built once here and reused on every call
+duplicate_file_names_query = sql_text("""
+    select file_name
+    from ptr_transactions
+    where file_name in :file_names
+    """).bindparams(bindparam("file_names", expanding=True))
+
+@lru_cache(maxsize=None)
+def existing_urls_query(file_table: str):
+    # table names can't be bound, so there's one statement per table
+    return sql_text(f"select url from {file_table} where year=:year")
+
 class HousePTRUpdater(Access):
     """
 
@@ -17,9 +33,10 @@ class HousePTRUpdater(Access):
             start_date: bool=None
             ):
         super().__init__(chamber='house')
-        if not start_date:
-            self.start_date = dt.strftime(dt.now(), "%Y-%m-%d")
-            self.year = dt.now().year
+        # the clock is read once, so a run that crosses midnight on new year's still looks at one year
+        now = dt.now()
+        self.start_date = start_date if start_date else dt.strftime(now, "%Y-%m-%d")
+        self.year = now.year
 
     def update_ptrs(self):
         """
@@ -32,13 +49,13 @@ class HousePTRUpdater(Access):
             None
         """
         # load ptr docs that aren't in db yet
-        new_ptr_docs_df = self.find_new_ptr_docs()
+        new_ptr_docs_df = self.find_new_docs()
         if len(new_ptr_docs_df):
             # don't process any ptr files that are already in ptr_transactions table
             filtered_ptr_docs_df = self.filter_out_duplicate_transactions(new_ptr_docs_df)
             if len(filtered_ptr_docs_df):
                 # parse new ptr docs
-                new_transactions_df = self.parse_all_docs(filtered_ptr_docs_df)
+                new_transactions_df = self.parse_docs(filtered_ptr_docs_df)
 
                 print("writing data...")
                 # write new transactions to table
@@ -61,10 +78,10 @@ class HousePTRUpdater(Access):
         Only PTRs for now, more later.
         """
         new_ptr_docs_df = self.get_new_docs()
-        existing_files = self.get_existing_file_names()
-        new_ptr_docs_df = new_ptr_docs_df.query("file_name not in @existing_files")
+        existing_files = set(self.get_existing_file_names())
+        new_ptr_docs_df = new_ptr_docs_df[~new_ptr_docs_df['file_name'].isin(existing_files)].copy()
 
-        new_ptr_docs_df['state'] = new_ptr_docs_df['jurisdiction'].map(make_state)
+        new_ptr_docs_df['state'] = make_state_series(new_ptr_docs_df['jurisdiction'])
         new_ptr_docs_df['handwritten'] = new_ptr_docs_df['file_name'].str.startswith("8")
 
         print(f"{len(new_ptr_docs_df)} new PTRs found")
@@ -76,63 +93,120 @@ class HousePTRUpdater(Access):
         """
         print("finding new PTRs...")
         if debug:
-            doc_list = get_doc_list(params={"FilingYear":2021})
+            doc_list = iter_doc_list(params={"FilingYear":2021})
         else:
-            doc_list = get_doc_list()
-        ptr_docs_df = pd.DataFrame(
-            doc_list,
+            doc_list = iter_doc_list(params={"FilingYear":self.year})
+        # rows stream straight into the dataframe, and non-PTR rows (doc_type is the 4th field) never get in
+        ptr_docs_df = pd.DataFrame.from_records(
+            (doc for doc in doc_list if 'PTR' in doc[3]),
             columns=['rep_name', 'jurisdiction', 'year', 'doc_type', 'url']
-        ).query("doc_type.str.contains('PTR')")
-        ptr_docs_df['file_name'] = ptr_docs_df['url'].map(os.path.basename)
+        )
+        ptr_docs_df['file_name'] = ptr_docs_df['url'].str.rsplit('/', n=1).str[-1]
         return ptr_docs_df
         
     def get_existing_file_names(self, file_table: str='doc_table', year=None):
+        """
+        File names (list) already in file_table for a year.
+        """
         # mostly for testing flexibility
         if not year:
             year = self.year
-        table_ptr_docs_df = self.read_from_db(f"""
-            select * from {file_table} where year="{year}"
-        """)
-        existing_files = table_ptr_docs_df['url'].map(os.path.basename)
+        # only the url is used, so only the url is pulled, and it's streamed off the cursor (no dataframe)
+        with self.engine.connect() as conn:
+            urls = conn.execute(existing_urls_query(file_table), {"year": str(year)}).scalars()
+            existing_files = [url.rsplit('/', 1)[-1] for url in urls]
         return existing_files
     
-    def parse_one_url(self, url):
-        url = urljoin('https://disclosures-clerk.house.gov', url)
-        cd = congressDoc(url)
+    def parse_one_url(self, url, http_pool=None):
+        url = urljoin(house_url, url)
+        return self.parse_one_doc(url, http_pool)
+
+    def parse_one_doc(self, input_, http_pool=None):
+        """
+        Parses one PTR doc (url or extracted xml, see congressDoc) into a transactions dataframe.
+        urls are downloaded with http_pool (defaults to the shared pool in house_helpers).
+        """
+        cd = congressDoc(input_, http_pool=http_pool)
         cd.full_parse()
         new_transactions_df = cd.make_dataframe()
         return new_transactions_df
     
-    def parse_docs(self, new_ptr_docs: pd.DataFrame) -> list:
+    def parse_docs(
+            self,
+            new_ptr_docs: pd.DataFrame,
+            max_workers: int=8,
+            max_processes: int=None,
+            cache_dir: str=None,
+            http_pool=None
+            ) -> list:
+        """
+        Downloads and parses new PTR docs.
+
+        Downloads run a few at a time on threads (mostly waiting on the house site), then the
+        pdfs are extracted and parsed on a process pool (pdfminer and the parse are cpu bound),
+        so only finished transaction records come back to this process.
+
+        Inputs:
+            new_ptr_docs (DataFrame) - new PTR docs from find_new_docs
+            max_workers (int) - max number of docs fetched at once
+            max_processes (int) - max number of pdfs parsed at once (defaults to the number of cpus)
+            cache_dir (str) - if set, converted xml is saved here and reused on re-runs
+            http_pool (PoolManager) - pool to download with, defaults to the shared pool in house_helpers
+
+        Outputs:
+            all_new_transactions_df (DataFrame) - transactions from every doc that parsed, with doc metadata
+        """
         print(f"parsing transactions from {len(new_ptr_docs)} new docs...")
-        transaction_df_collector = []
-        for row in tqdm(new_ptr_docs.query("doc_type.str.contains('PTR') and handwritten==False").iterrows()):
-            new_transactions_df = self.parse_one_url(row['url'])
-            for k,v in row.to_dict().items():
-                new_transactions_df[k] = v
-            transaction_df_collector.append(new_transactions_df)
-        all_new_transactions_df = pd.concat(transaction_df_collector)
+        mask = new_ptr_docs['doc_type'].str.contains('PTR', regex=False) & ~new_ptr_docs['handwritten']
+        rows = new_ptr_docs[mask].to_dict('records')
+
+        # one bad pdf shouldn't sink the whole batch
+        pdfs = []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rows)))) as executor:
+            futures = [executor.submit(load_pdf, urljoin(house_url, row['url']), http_pool) for row in rows]
+            for row, future in zip(rows, futures):
+                try:
+                    pdfs.append((row, future.result()))
+                except Exception as e:
+                    print(f"error downloading {row['url']}: {e}")
+
+        # transactions from every doc go into one flat list of records, made into a df once at the end
+        transaction_records = []
+        with ProcessPoolExecutor(max_workers=max_processes) as executor:
+            futures = [executor.submit(parse_pdf, pdf, cache_dir) for row, pdf in pdfs]
+            # redraw the bar at most twice a second (or every 1% of docs)
+            for (row, pdf), future in tqdm(
+                zip(pdfs, futures), total=len(pdfs),
+                miniters=max(1, len(pdfs) // 100), mininterval=0.5, smoothing=0.1
+                ):
+                try:
+                    new_transaction_records = future.result()
+                except Exception as e:
+                    print(f"error parsing {row['url']}: {e}")
+                    continue
+                # add doc metadata to each transaction
+                transaction_records.extend([{**record, **row} for record in new_transaction_records])
+        all_new_transactions_df = make_ptr_dataframe(transaction_records)
         return all_new_transactions_df
     
-    def filter_out_duplicate_transactions(self, new_ptr_docs: pd.DataFrame) -> list:
+    def filter_out_duplicate_transactions(self, new_ptr_docs: pd.DataFrame, chunk_size: int=1000) -> list:
         """
         Compares incoming new ptr docs to existing transactions and returns only file names that aren't already in the database.
+
+        See Access.read_in_chunks for chunk_size.
         """
-        dup_file_names = self.read_from_db(f"""
-                select file_name
-                from ptr_transactions 
-                where file_name in ({str(new_ptr_docs['file_name'].unique())[1:-1]})
-                """)
+        dup_file_names = self.read_in_chunks(
+            duplicate_file_names_query, "file_names", new_ptr_docs['file_name'].unique(), chunk_size
+            )
         filtered_ptr_docs_df = new_ptr_docs[~new_ptr_docs['file_name'].isin(dup_file_names)]
         return filtered_ptr_docs_df
     
     
     def send_ptr_text(self, new_ptr_docs_df: pd.DataFrame):
-        file_data = "\n".join(
-            [
-                " / ".join(v) for v in new_ptr_docs_df[
-                ['name', 'jurisdiction', 'file_name']].drop_duplicates().values
-            ])
+        # dict keys dedupe the rows and keep their order
+        file_rows = dict.fromkeys(new_ptr_docs_df[
+            ['rep_name', 'jurisdiction', 'file_name']].itertuples(index=False, name=None))
+        file_data = "\n".join([" / ".join(v) for v in file_rows])
 
         payload = f"**NEW HOUSE PTRs**\n\n{file_data}"
         self.send_text(payload)
@@ -1,33 +1,126 @@
 import os
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.firefox.options import Options
+from io import StringIO
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
 import pandas as pd
+import numpy as np
+import regex as re
 from typing import List
 
-senate_url = 'https://efdsearch.senate.gov/search/home'
+senate_base_url = 'https://efdsearch.senate.gov'
+senate_url = senate_base_url + '/search/home'
+senate_search_url = senate_base_url + '/search/'
+senate_report_data_url = senate_base_url + '/search/report/data/'
+
+search_row_strainer = SoupStrainer('tr')
+
+# seconds to wait on the senate site before giving up on a request
+http_timeout = 10
+
+def load_senate_session() -> requests.Session:
+    """
+    Opens an http session on the senate search site and accepts the TOS (no browser needed).
+
+    Input:
+        None
+
+    Output:
+        session (requests.Session) - session with the TOS cookie and csrf header set
+    """
+    print('loading senate session...')
+    session = requests.Session()
+    home = session.get(senate_url + '/', timeout=http_timeout)
+    home.raise_for_status()
+    csrf = BeautifulSoup(home.content, 'lxml').find(attrs={'name':'csrfmiddlewaretoken'})['value']
+
+    print("acknowleding senate TOS...")
+    session.post(
+        senate_url + '/',
+        data={'csrfmiddlewaretoken': csrf, 'prohibition_agreement': '1'},
+        headers={'Referer': senate_url + '/'},
+        timeout=http_timeout
+        ).raise_for_status()
+    session.headers.update({
+        'X-CSRFToken': session.cookies.get('csrftoken', session.cookies.get('csrf', csrf)),
+        'Referer': senate_search_url
+        })
+    return session
+
+def load_driver_session(driver) -> requests.Session:
+    """
+    Opens an http session that shares a webdriver's cookies, so pages the driver has access to (past the TOS) can be fetched without it.
+
+    Input:
+        driver - selenium webdriver that has already accepted the TOS
+
+    Output:
+        session (requests.Session) - session with the driver's cookies
+    """
+    session = requests.Session()
+    session.cookies.update({c['name']: c['value'] for c in driver.get_cookies()})
+    session.headers.update({'Referer': senate_search_url})
+    return session
+
+def search_report_data(session: requests.Session, start_date: str, start: int=0, length: int=100) -> dict:
+    """
+    Gets one page of senator PTR search results from the endpoint behind the search page's results table.
+
+    Input:
+        session (requests.Session) - from load_senate_session
+        start_date (str) - earliest filing date, mm/dd/yyyy
+        start (int) - index of the first result
+        length (int) - results per page
+
+    Output:
+        (dict) - 'data' is a list of result rows, 'recordsFiltered' the total result count
+    """
+    r = session.post(senate_report_data_url, data={
+        'start': str(start),
+        'length': str(length),
+        'report_types': '[11]', # PTRs
+        'filer_types': '[1]', # senators
+        'submitted_start_date': f'{start_date} 00:00:00',
+        'submitted_end_date': '',
+        'candidate_state': '',
+        'senator_state': '',
+        'office_id': '',
+        'first_name': '',
+        'last_name': '',
+        'csrfmiddlewaretoken': session.headers['X-CSRFToken']
+        }, timeout=http_timeout)
+    r.raise_for_status()
+    return r.json()
 
 def load_senate_driver(
         chrome: bool=True,
-        headless: bool=True
+        headless: bool=True,
+        profile_dir: str=None
         ):
     """
     Opens a firefox browser, loads the senate search page and accepts the popup.
 
     Input:
-        None
+        profile_dir (str) - chrome only, keeps the browser profile (and the TOS cookie) here between runs
 
     Output:
         driver - chromedriver or firefox window
         wait - wait object (5 sec)
     """
+    # selenium is only imported when a driver is actually needed (the http scraper doesn't use it)
+    from selenium import webdriver
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.firefox.options import Options
+
     print('loading driver...')
     
     if chrome:
         print("Running Chrome Webdriver to pull Senator data...")
         chrome_options = webdriver.ChromeOptions()
         chrome_options.add_argument("--headless")
+        # don't wait for images and stylesheets, the dom is all that's needed
+        chrome_options.page_load_strategy = 'eager'
+        if profile_dir:
+            chrome_options.add_argument(f"--user-data-dir={profile_dir}")
 
         
         if "HEROKU" in os.environ:
@@ -43,6 +136,7 @@ def load_senate_driver(
     else:
         print("Running Firefox Webdriver to pull Senator data...")
         options = Options()
+        options.page_load_strategy = 'eager'
         if headless:
             options.add_argument('-headless')
 
@@ -64,29 +158,71 @@ def scrape_senate_row(row) -> dict:
     Output:
         row_dict (dict) - formatted search result data
     """
-    row_text = [r.text for r in row.find_all('td')]
+    tds = row.find_all('td')
+    row_text = [r.text for r in tds]
     
     if len(row_text) > 1:
-        row_dict = dict(
-            zip(['Name (First)', 'Name (Last)', 'Status', 'Filing Type', 'Filing Date'], 
-                row_text))
-        row_dict['URL'] = row.find_all('td')[3].a['href']
-        filing_code = filing_typer(row_dict['Filing Type'].lower())
+        return make_senate_row_dict(row_text, tds[3].a['href'])
+
+def scrape_senate_json_row(row: list) -> dict:
+    """
+    For parsing senate search results from search_report_data.
+
+    Input:
+        row (list) - one row of search_report_data results (same cells as the search results table, link as html)
+
+    Output:
+        row_dict (dict) - formatted search result data
+    """
+    link = BeautifulSoup(row[3], 'lxml').a
+    return make_senate_row_dict(row[:3] + [link.text] + row[4:], link['href'])
+
+def make_senate_row_dict(row_text: list, url: str) -> dict:
+    """
+    Formats one senate search result.
+
+    Input:
+        row_text (list) - text of each cell of the result
+        url (str) - url of the filing
+
+    Output:
+        row_dict (dict) - formatted search result data
+    """
+    row_dict = dict(
+        zip(['Name (First)', 'Name (Last)', 'Status', 'Filing Type', 'Filing Date'], 
+            row_text))
+    row_dict['URL'] = url
+    filing_code = filing_typer(row_dict['Filing Type'].lower())
+    
+    if 'paper' in row_dict['URL']:
+        filing_code += 'H'  # for 'Handwritten'
+    else:
+        filing_code += 'W'  # for 'web'
         
-        if 'paper' in row_dict['URL']:
-            filing_code += 'H'  # for 'Handwritten'
-        else:
-            filing_code += 'W'  # for 'web'
-            
-        row_dict['Filing Code'] = filing_code
-        row_dict['State'] = 'UN' # how do i find state?
-        row_dict['File Name'] = '_'.join(
-            [row_dict[k] for k in ['Name (Last)', 'State', 'Filing Code', 'Filing Date']]
-        ).replace(", ", "_") + '.html'
-        row_dict['Handwritten'] = True if 'H' in row_dict['Filing Code'] else False
-        row_dict['File_Key'] = row_dict['URL'].split("/")[-2]
-
-        return row_dict
+    row_dict['Filing Code'] = filing_code
+    row_dict['State'] = 'UN' # how do i find state?
+    row_dict['File Name'] = '_'.join(
+        [row_dict[k] for k in ['Name (Last)', 'State', 'Filing Code', 'Filing Date']]
+    ).replace(", ", "_") + '.html'
+    row_dict['File_Key'] = row_dict['URL'].split("/")[-2]
+
+    return row_dict
+
+def build_files_frame(search_row_dicts: List[dict]) -> pd.DataFrame:
+    """
+    Makes a df of formatted senate search results, adding 'Handwritten' for all rows at once.
+
+    Input:
+        search_row_dicts (list) - from make_senate_row_dict
+
+    Output:
+        search_row_df (DataFrame)
+    """
+    search_row_df = pd.DataFrame(search_row_dicts)
+    if search_row_df.empty:
+        return search_row_df
+    search_row_df['Handwritten'] = search_row_df['Filing Code'].str.contains('H', regex=False)
+    return search_row_df
 
 def filing_typer(filing_type: str) -> str:
     """
@@ -98,8 +234,9 @@ def filing_typer(filing_type: str) -> str:
     Output:
         code (str)
     """
-    code = ''
-    code = ''.join([v for k, v in f_types.items() if k in filing_type])
+    # codes go in f_types order (not the order they show up in), once each
+    found = {m.lastgroup for m in f_type_regex.finditer(filing_type)}
+    code = ''.join([v for v in f_types.values() if v in found])
 
     if '(amendment' in filing_type:
         code += 'X'
@@ -113,25 +250,19 @@ def filing_typer(filing_type: str) -> str:
 
     return code
 
-def disabled_check(source):
+def extract_ptr_records(ptr_row, ptr_page_source) -> List[dict]:
     """
-    Ham-fisted check if "Next" button on senate search page is disabled.
-    
-    returns True if it IS DISABLED.
+    Extracts the transactions from one PTR page as records, with the PTR's search result data added.
+
+    Input:
+        ptr_row (dict) - search result for the PTR
+        ptr_page_source (str) - html of the PTR page
+
+    Output:
+        output_ptr_list (list) - one dict per transaction
     """
-    soup = BeautifulSoup(source, 'lxml')
-    try:
-        if 'disabled' in soup.find('a', attrs={'id':'filedReports_next'})['class']:
-            return True
-        else:
-            return False
-    except IndexError:
-        print('error')
-        return False
-
-### PARSERS
-def extract_ptr_transactions(ptr_row, ptr_page_source):
-    ptr_list = pd.read_html(ptr_page_source)
+    # lxml only (no bs4/html5lib fallback), the PTR pages are well formed
+    ptr_list = pd.read_html(StringIO(ptr_page_source), flavor='lxml')
     output_ptr_list = []
     for ptr in ptr_list:
         # add addn data
@@ -141,12 +272,37 @@ def extract_ptr_transactions(ptr_row, ptr_page_source):
             p['Filing Type_'] = ptr_row['Filing Type']
             p['Filing Date_'] = ptr_row['Filing Date']
             output_ptr_list.append(p)
-    ptr_df = pd.DataFrame(output_ptr_list)
-    ptr_df['Sale'] = ptr_df['Type'].map(lambda x: True if 'Sale' in x else False)
-    ptr_df['Amount Min'] = ptr_df.apply(lambda r: parse_ptr(r['Amount'], r['Sale'])[0], 1)
-    ptr_df['Amount Max'] = ptr_df.apply(lambda r: parse_ptr(r['Amount'], r['Sale'])[1], 1)
+    return output_ptr_list
+
+def add_ptr_amounts(ptr_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds 'Sale', 'Amount Min' and 'Amount Max' columns to a df of PTR transactions.
+    """
+    ptr_df['Sale'] = ptr_df['Type'].str.contains('Sale', regex=False, na=False)
+
+    # same as parse_ptr, for the whole column at once (sales flip sign and swap min/max)
+    # one lookup gives both bounds as a 2 column array
+    bounds = ptr_code_bounds.reindex(ptr_df['Amount']).to_numpy()
+    amount_min, amount_max = bounds[:, 0], bounds[:, 1]
+    sale = ptr_df['Sale'].to_numpy()
+    ptr_df['Amount Min'] = np.where(sale, -amount_max, amount_min)
+    ptr_df['Amount Max'] = np.where(sale, -amount_min, amount_max)
     return ptr_df
 
+def make_ptr_transactions_frame(ptr_records: List[dict]) -> pd.DataFrame:
+    """
+    Makes a df of PTR transaction records (from one page or many) with amounts added, with the PTR columns even if there are none.
+    """
+    if not ptr_records:
+        return pd.DataFrame(columns=ptr_transaction_columns).astype(ptr_transaction_dtypes)
+    return add_ptr_amounts(pd.DataFrame(ptr_records))
+
+def extract_ptr_transactions(ptr_row, ptr_page_source) -> pd.DataFrame:
+    """
+    Makes a df of the transactions on one PTR page. See extract_ptr_records and add_ptr_amounts.
+    """
+    return make_ptr_transactions_frame(extract_ptr_records(ptr_row, ptr_page_source))
+
 def parse_ptr(v, sale_):
     v_out = ptr_code[v]
     if sale_ is True:
@@ -156,7 +312,8 @@ def parse_ptr(v, sale_):
 def get_all_search_row_data(search_source_data: dict) -> List[dict]:
     search_row_dicts = []
     for source_data in search_source_data:
-        soup = BeautifulSoup(source_data, 'lxml')
+        # only table rows get built into the tree, the rest of the page is skipped
+        soup = BeautifulSoup(source_data, 'lxml', parse_only=search_row_strainer)
         search_rows = soup.find_all('tr')
         for search_row in search_rows:
             search_row_dict = scrape_senate_row(search_row)
@@ -181,6 +338,16 @@ f_types = {
         'termination report': 'T'
     }
 
+# every filing type in one pass, each named group is the code for its type
+f_type_regex = re.compile("|".join([f"(?P<{v}>{re.escape(k)})" for k, v in f_types.items()]))
+
+# columns of a PTR transactions df: the table on the PTR page, what extract_ptr_records adds, then add_ptr_amounts
+ptr_transaction_columns = [
+    '#', 'Transaction Date', 'Owner', 'Ticker', 'Asset Name', 'Asset Type', 'Type', 'Amount', 'Comment',
+    'Name_', 'File Name', 'Filing Type_', 'Filing Date_', 'Sale', 'Amount Min', 'Amount Max'
+    ]
+ptr_transaction_dtypes = {'Sale': bool, 'Amount Min': float, 'Amount Max': float}
+
 ptr_code = {
     '$1,001 - $15,000': [1001, 15000],
     '$15,001 - $50,000': [15001, 50000],
@@ -190,4 +357,6 @@ ptr_code = {
     '$500,001 - $1,000,000': [500001, 1000000],
     '$50,001 - $100,000': [50001, 100000],
     '$5,000,001 - $25,000,000': [5000001, 25000000]
-    }
\ No newline at end of file
+    }
+
+ptr_code_bounds = pd.DataFrame.from_dict(ptr_code, orient='index', columns=['min', 'max'])
@@ -1,28 +1,52 @@
-import time
 import datetime as dt
+import threading
+import requests
 import pandas as pd
-from urllib.parse import urljoin
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
+from concurrent.futures import ThreadPoolExecutor
 from typing import Literal
+from sqlalchemy import bindparam, text as sql_text
 from .access import Access
 from .senate_helpers import (
-    load_senate_driver, disabled_check, get_all_search_row_data, extract_ptr_transactions, senate_url
+    load_senate_driver, get_all_search_row_data, extract_ptr_records, make_ptr_transactions_frame, senate_url, senate_base_url,
+    load_senate_session, load_driver_session, search_report_data, scrape_senate_json_row, build_files_frame,
+    http_timeout
     )
 
+# statement for SenatePTRUpdater.find_new_file_keys, built once here
+existing_file_keys_query = sql_text("""
+    select File_Key
+    from ptr_files
+    where File_Key in :keys
+    """).bindparams(bindparam("keys", expanding=True))
+
 class SenatePTRUpdater(Access):
+    """
+    Scrapes new senate PTRs.
+
+    By default this scrapes through a selenium webdriver (chrome, headless and profile_dir only apply then).
+    Set use_driver=False to talk to the senate site over plain http instead (not yet run against the live site).
+    selenium is only imported on the driver path.
+    Pass profile_dir to keep the chrome profile between runs, so the TOS only needs accepting once.
+    """
     def __init__(self, 
             chrome: bool=True, 
             headless: bool=True,
-            start_date: bool=None
+            start_date: bool=None,
+            use_driver: bool=True,
+            profile_dir: str=None
         ):
         self.chrome = chrome
+        self.profile_dir = profile_dir
         self.headless = headless
+        self.use_driver = use_driver
+        # per-thread copies of self.session, see thread_session
+        self._thread_sessions = threading.local()
         self.start_date = start_date if start_date else (
             dt.datetime.today()-dt.timedelta(1)).strftime("%m/%d/%Y")
         print(f'starting senate scrape at {self.start_date}...')
         super().__init__(chamber='senate')
-        self.load_driver()
+        if self.use_driver:
+            self.load_driver()
 
     def full_ptr_updater(self):
         new_ptr_files_df = self.get_new_file_list()
@@ -36,11 +60,12 @@ class SenatePTRUpdater(Access):
                 self.update_db(data, db)
             self.text_new_files(new_ptr_files_df)
 
-        self.driver.quit()
+        if self.use_driver:
+            self.driver.quit()
         return
 
     def load_driver(self):
-        self.driver, self.wait = load_senate_driver(self.chrome, self.headless)
+        self.driver, self.wait = load_senate_driver(self.chrome, self.headless, self.profile_dir)
         return
     
     def acknowledge_TOS(self):
@@ -53,6 +78,14 @@ class SenatePTRUpdater(Access):
         Outputs:
             None
         """
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.common.by import By
+
+        # with a saved profile the TOS may already be accepted, then there's nothing to click
+        if not self.driver.find_elements(By.ID, 'agree_statement'):
+            print("senate TOS already accepted...")
+            return
+
         print("acknowleding senate TOS...")
         self.wait.until(EC.element_to_be_clickable((By.XPATH, "//*[@id='agree_statement']"))).click()
         return
@@ -67,6 +100,9 @@ class SenatePTRUpdater(Access):
         Outputs:
             None
         """
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.common.by import By
+
         print("...selecting all states...")
         senate_check = self.wait.until(
             EC.presence_of_element_located((By.CSS_SELECTOR, '.senator_filer'))) # probably works better
@@ -104,14 +140,18 @@ class SenatePTRUpdater(Access):
         Outputs:
             None
         """
-        if 'driver' not in self.__dir__():
-            self.load_driver(self.chrome, self.headless)
-        self.driver.get(senate_url)
-        self.acknowledge_TOS()
-        self.set_PTR_search_params()
+        if self.use_driver:
+            if 'driver' not in self.__dir__():
+                self.load_driver()
+            self.driver.get(senate_url)
+            self.acknowledge_TOS()
+            self.set_PTR_search_params()
 
-        search_result_data = self.scrape_PTR_search()
-        search_row_dicts = get_all_search_row_data(search_result_data)
+            search_result_data = self.scrape_PTR_search()
+            search_row_dicts = get_all_search_row_data(search_result_data)
+        else:
+            self.session = load_senate_session()
+            search_row_dicts = self.scrape_PTR_search_data()
         new_ptr_files_df = self.filter_new_files(search_row_dicts)
         return new_ptr_files_df
 
@@ -124,26 +164,61 @@ class SenatePTRUpdater(Access):
         Ouput:
             search_result_data (dict)
         """
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.common.by import By
+
         page_index = 1
         
         search_result_data = []
         while True:
             print(page_index)
+            # page_source serializes the whole page through the driver, so it's read once per page
             search_result_data.append(self.driver.page_source)
+            # checking before clicking means the last page is already saved when the loop ends
+            if self.next_disabled():
+                break
+            # wait for the table to redraw (the old first row goes stale) rather than a fixed sleep
+            old_row = self.driver.find_element(By.CSS_SELECTOR, '#filedReports tbody tr')
             next_button = self.driver.find_element(By.ID, 'filedReports_next')
             next_button.click()
-            time.sleep(2)
-            if disabled_check(self.driver.page_source):
-                break
+            self.wait.until(EC.staleness_of(old_row))
             page_index += 1
-
-        # last row -- this is ugly and only necessary because "disabled_check" is clumsy
-        # ("disabled_check" is clumsy due to weirdness on the senate side)
-        # duplicates removed later
-        if page_index > 1:
-            print(page_index)
-            search_result_data.append(self.driver.page_source)
         return search_result_data
+
+    def next_disabled(self) -> bool:
+        """
+        Checks the "Next" button on the senate search page straight from the driver (no need to parse the whole page).
+
+        returns True if it IS DISABLED.
+        """
+        from selenium.webdriver.common.by import By
+
+        next_class = self.driver.find_element(By.ID, 'filedReports_next').get_attribute('class') or ''
+        return 'disabled' in next_class.split()
+
+    def scrape_PTR_search_data(self, page_length: int=100, max_workers: int=4) -> list:
+        """
+        Gets every PTR search result since start_date over http.
+
+        The first page gives the total number of results, then the rest of the pages are fetched a few at a time.
+
+        Input:
+            page_length (int) - results per request
+            max_workers (int) - max number of pages fetched at once
+
+        Output:
+            search_row_dicts (list) - formatted search results
+        """
+        first_page = search_report_data(self.session, self.start_date, 0, page_length)
+        starts = range(page_length, first_page['recordsFiltered'], page_length)
+        print(f"{len(starts) + 1} pages of search results...")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pages = [first_page] + list(executor.map(
+                lambda start: search_report_data(self.thread_session(), self.start_date, start, page_length),
+                starts
+                ))
+        search_row_dicts = [scrape_senate_json_row(row) for page in pages for row in page['data']]
+        return search_row_dicts
         
     def filter_new_files(self, search_row_dicts: dict) -> pd.DataFrame:
         """
@@ -155,35 +230,96 @@ class SenatePTRUpdater(Access):
         Output:
             new_ptr_files_df
         """
-        search_row_df = pd.DataFrame(search_row_dicts).drop_duplicates()
-        ptr_files_found = search_row_df['File_Key'].nunique()
+        # File_Key is unique to a filing, so dedupe on it before building the df (the driver scrape repeats its last page)
+        unique_row_dicts = {}
+        for search_row_dict in search_row_dicts:
+            unique_row_dicts.setdefault(search_row_dict['File_Key'], search_row_dict)
+        search_row_df = build_files_frame(list(unique_row_dicts.values()))
+        ptr_files_found = len(search_row_df)
         print(f"{ptr_files_found} senate PTR files found ...")
         if ptr_files_found > 0:
-            old_keys = self.read_from_db("select distinct(File_Key) from ptr_files")['File_Key'].unique()
-            new_ptr_files_df = search_row_df.query("~File_Key.isin(@old_keys)")
+            new_keys = self.find_new_file_keys(search_row_df['File_Key'].unique())
+            new_ptr_files_df = search_row_df[search_row_df['File_Key'].isin(new_keys)]
             print(f"{len(new_ptr_files_df)} new senate PTR files found ...")
             return new_ptr_files_df
         else:
             print("no new senate PTRs!")
             return
         
-    def get_new_ptr_transactions(self, new_ptr_files_df: pd.DataFrame) -> pd.DataFrame:
+    def find_new_file_keys(self, file_keys, chunk_size: int=1000) -> set:
         """
+        Checks file keys against ptr_files in the database, so only the keys found are sent back (not every key in the table).
+
+        Input:
+            file_keys (list-like) - File_Keys from search results
+            chunk_size (int) - max number of keys per query (see Access.read_in_chunks)
+
+        Output:
+            new_keys (set) - File_Keys not in ptr_files yet
+        """
+        file_keys = set(file_keys)
+        new_keys = file_keys - self.read_in_chunks(existing_file_keys_query, "keys", file_keys, chunk_size)
+        return new_keys
+
+    def get_new_ptr_transactions(self, new_ptr_files_df: pd.DataFrame, max_workers: int=8) -> pd.DataFrame:
+        """
+        PTR pages are plain html, so they're fetched over http a few at a time (even when scraping with the driver).
+
         Input:
             new_ptr_files_df (DataFrame) - df of search results for new ptrs
+            max_workers (int) - max number of PTR pages fetched at once
 
         Output:
             new_ptr_transactions_df (DataFrame) - df of transactions from new ptrs (excluding handwritten)
         """
-        ptrs = []
-        for ptr_row in new_ptr_files_df.query("Handwritten==False").to_dict('records'):
-            self.driver.get(urljoin('https://efdsearch.senate.gov/', ptr_row['URL']))
-            ptr_page_source = self.driver.page_source
-            ptr_transactions_df = extract_ptr_transactions(ptr_row, ptr_page_source)
-            ptrs.append(ptr_transactions_df)
-        new_ptr_transactions_df = pd.concat(ptrs)
+        ptr_rows = new_ptr_files_df[~new_ptr_files_df['Handwritten']].to_dict('records')
+        if self.use_driver:
+            self.session = load_driver_session(self.driver)
+        # records from every page go into one df, rather than a df per page and a concat
+        # one bad PTR page shouldn't sink the whole batch
+        ptr_records = []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ptr_rows)))) as executor:
+            futures = [executor.submit(self.fetch_ptr_html, ptr_row['URL']) for ptr_row in ptr_rows]
+            for ptr_row, future in zip(ptr_rows, futures):
+                try:
+                    ptr_records += extract_ptr_records(ptr_row, future.result())
+                except Exception as e:
+                    print(f"error parsing {ptr_row['URL']}: {e}")
+        new_ptr_transactions_df = make_ptr_transactions_frame(ptr_records)
         return new_ptr_transactions_df
     
+    def fetch_ptr_html(self, ptr_url: str) -> str:
+        """
+        Gets the html of one PTR page with this thread's copy of self.session (see thread_session).
+
+        Input:
+            ptr_url (str) - url of the PTR, or its path on the senate site (as in search results)
+
+        Output:
+            (str) - html of the PTR page
+        """
+        # search result urls are site paths, so plain concatenation does what urljoin would
+        if not ptr_url.startswith('http'):
+            ptr_url = senate_base_url + ptr_url if ptr_url.startswith('/') else senate_base_url + '/' + ptr_url
+        r = self.thread_session().get(ptr_url, timeout=http_timeout)
+        r.raise_for_status()
+        return r.text
+
+    def thread_session(self) -> requests.Session:
+        """
+        A copy of self.session for the calling thread, with its cookies and headers.
+
+        requests doesn't promise a Session is thread safe, so threads fetching at once each get their own.
+        The copy is remade if self.session has been replaced since.
+        """
+        local = self._thread_sessions
+        if getattr(local, 'source', None) is not self.session:
+            session = requests.Session()
+            session.headers.update(self.session.headers)
+            session.cookies.update(self.session.cookies)
+            local.source, local.session = self.session, session
+        return local.session
+
     def update_db(self, data: pd.DataFrame, db: Literal['ptr_files', 'transactions']):
         if db not in ['ptr_files', 'transactions']:
             raise ValueError("Invalid data_contents options")
@@ -191,11 +327,10 @@ class SenatePTRUpdater(Access):
         return
     
     def text_new_files(self, new_ptr_files_df: pd.DataFrame):
-        file_data = "\n".join(
-            [
-                " / ".join(v) for v in new_ptr_files_df[
-                ['Name (Last)', 'Name (First)', 'Filing Type']].drop_duplicates().values
-            ])
+        # dict keys dedupe the rows and keep their order
+        file_rows = dict.fromkeys(new_ptr_files_df[
+            ['Name (Last)', 'Name (First)', 'Filing Type']].itertuples(index=False, name=None))
+        file_data = "\n".join([" / ".join(v) for v in file_rows])
         payload = f"**NEW SENATE PTRs**\n\n{file_data}"
         self.send_text(payload)
         return
@@ -0,0 +1,64 @@
+import pytest
+import os
+import pandas as pd
+from sludgewire.house_helpers import congressDoc
+from sludgewire.house_parser_helpers import (
+    classify_lines, doc_trigger, doc_ender, table_trigger, entry_trigger, header_check
+    )
+
+fixture_path = os.path.join(os.path.dirname(__file__), "fixtures", "house_ptr.xml")
+
+@pytest.fixture(scope="module")
+def cd():
+    with open(fixture_path, "rb") as f:
+        cd = congressDoc(f.read())
+    cd.full_parse()
+    return cd
+
+def test_full_parse(cd):
+    # two pages, one table, the second entry starts at the top of page 2
+    assert cd.all_transactions == [[
+        [
+            "sp||apple inc. (aapl) [st]||p||01/03/2023 01/05/2023||$1,001 - $15,000",
+            "f s: new",
+            "d: bought in a managed account"
+        ],
+        [
+            "microsoft corporation (msft) [st]||s (partial)||02/10/2023||02/14/2023||$15,001 - $50,000",
+            "f s: new",
+            "CHECK"
+        ]
+    ]]
+
+def test_make_dataframe(cd):
+    df = cd.make_dataframe()
+    assert len(df) == 2
+    assert df['owner'].tolist() == ['sp', '']
+    assert df['asset'].tolist() == ['apple inc. (aapl) [st]', 'microsoft corporation (msft) [st] CHECK']
+    assert df['transaction_type'].tolist() == ['p', 's (partial)']
+    assert df['date'].tolist() == ['01/03/2023', '02/10/2023']
+    assert df['notification_date'].tolist() == ['01/05/2023', '02/14/2023']
+    assert df['amount'].tolist() == ['$1,001 - $15,000', '$15,001 - $50,000']
+    assert df['over_200'].tolist() == [False, True]
+    assert df['filing status'].tolist() == ['new', 'new']
+    assert df.loc[0, 'description'] == 'bought in a managed account'
+
+def test_classify_lines():
+    # the vectorized checks should agree with the line-by-line ones
+    spacer = "||"
+    lines = pd.Series([
+        "transactions",
+        "id||owner||asset||transaction||date||notification||amount||cap.",
+        "sp||apple inc. (aapl) [st]||p||01/03/2023 01/05/2023||$1,001 - $15,000",
+        "abc01/03/2023",
+        "f s: new",
+        "s b: t",
+        "$200?",
+        "* for the complete list of asset type abbreviations, please visit",
+        ""
+    ])
+    checks = classify_lines(lines, spacer)
+    for i, t in lines.items():
+        assert checks.loc[i].tolist() == [
+            doc_trigger(t), doc_ender(t), table_trigger(t), entry_trigger(t), header_check(t, spacer)
+        ], t
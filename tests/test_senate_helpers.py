@@ -0,0 +1,43 @@
+import pytest
+from bs4 import BeautifulSoup
+from sludgewire.senate_helpers import scrape_senate_row, scrape_senate_json_row
+
+# one result as the /search/report/data/ endpoint sends it, and the same result as a row of the search results table
+json_rows = [
+    [
+        "John", "Smith", "Smith, John (Senator)",
+        '<a href="/search/view/ptr/378080ec-6299-4274-a5e6-aa4f68577985/" target="_blank">Periodic Transaction Report for 01/05/2023</a>',
+        "01/06/2023"
+    ],
+    [
+        "Jane", "Doe", "Doe, Jane (Senator)",
+        '<a href="/search/view/paper/0b4e1d22-6a8f-4c53-9c4e-8f1a2d7e5b10/" target="_blank">Periodic Transaction Report (Amendment 1)</a>',
+        "02/14/2023"
+    ]
+]
+
+html_rows = """
+<table><tbody>
+<tr>
+    <td>John</td><td>Smith</td><td>Smith, John (Senator)</td>
+    <td><a href="/search/view/ptr/378080ec-6299-4274-a5e6-aa4f68577985/" target="_blank">Periodic Transaction Report for 01/05/2023</a></td>
+    <td>01/06/2023</td>
+</tr>
+<tr>
+    <td>Jane</td><td>Doe</td><td>Doe, Jane (Senator)</td>
+    <td><a href="/search/view/paper/0b4e1d22-6a8f-4c53-9c4e-8f1a2d7e5b10/" target="_blank">Periodic Transaction Report (Amendment 1)</a></td>
+    <td>02/14/2023</td>
+</tr>
+</tbody></table>
+"""
+
+@pytest.mark.parametrize("i", range(len(json_rows)))
+def test_json_row_matches_html_row(i):
+    html_row = BeautifulSoup(html_rows, 'lxml').find_all('tr')[i]
+    assert scrape_senate_json_row(json_rows[i]) == scrape_senate_row(html_row)
+
+def test_json_row():
+    row_dict = scrape_senate_json_row(json_rows[1])
+    assert row_dict['URL'] == '/search/view/paper/0b4e1d22-6a8f-4c53-9c4e-8f1a2d7e5b10/'
+    assert row_dict['Filing Code'] == 'PX_H'
+    assert row_dict['File_Key'] == '0b4e1d22-6a8f-4c53-9c4e-8f1a2d7e5b10'
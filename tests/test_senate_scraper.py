@@ -7,7 +7,9 @@ from sludgewire.senate_helpers import get_all_search_row_data, senate_url, extra
 
 @pytest.fixture(scope="module")
 def spu():
-    return SenatePTRUpdater()
+    spu = SenatePTRUpdater(use_driver=True)
+    yield spu
+    spu.driver.quit()
 
 def test_senate_search(spu):
     spu.driver.get(senate_url)
@@ -19,7 +21,6 @@ def test_senate_search(spu):
     senate_check.click()
     state_dropdown = Select(senate_check)
     state_dropdown.select_by_visible_text("Alaska")
-    senate_check.click()
 
     for id, date in zip(
         ['fromDate', 'toDate'], 
@@ -43,7 +44,6 @@ def test_senate_search(spu):
 
     ptr_row = search_row_dicts[-1]
     ptr_transactions = extract_ptr_transactions(ptr_row, ptr_page_source)
-    spu.driver.quit()
 
     assert len(search_row_dicts) == 6
     assert '378080ec-6299-4274-a5e6-aa4f68577985' in [d['File_Key'] for d in search_row_dicts]
@@ -0,0 +1,31 @@
+import pytest
+import time
+import requests
+import sludgewire.senate_updater as senate_updater
+from sludgewire.senate_updater import SenatePTRUpdater
+
+@pytest.fixture(scope="module")
+def spu():
+    spu = SenatePTRUpdater(use_driver=False, start_date="01/01/2023")
+    spu.session = requests.Session()
+    return spu
+
+@pytest.mark.parametrize("total, n_pages", [(0, 1), (100, 1), (250, 3)])
+def test_scrape_PTR_search_data(spu, monkeypatch, total, n_pages):
+    starts = []
+
+    def fake_search_report_data(session, start_date, start, length):
+        starts.append(start)
+        # later pages come back first, so the rows have to be put back in order
+        time.sleep(0.01 * (total - start) / 100)
+        return {
+            'recordsFiltered': total,
+            'data': [[i] for i in range(start, min(start + length, total))]
+            }
+
+    monkeypatch.setattr(senate_updater, "search_report_data", fake_search_report_data)
+    monkeypatch.setattr(senate_updater, "scrape_senate_json_row", lambda row: row[0])
+
+    search_row_dicts = spu.scrape_PTR_search_data(page_length=100)
+    assert sorted(starts) == list(range(0, n_pages * 100, 100))
+    assert search_row_dicts == list(range(total))